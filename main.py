@@ -1,11 +1,20 @@
+import asyncio
+import functools
+import itertools
 import os
+import uuid
 import json
 import datetime
 from typing import Any, Dict, List, Optional
 
+import orjson
+
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
+
+from jinja2 import Environment, FileSystemLoader, FileSystemBytecodeCache
+
+from pydantic import BaseModel
 
 from google.cloud import firestore
 
@@ -27,14 +36,81 @@ FIRESTORE_DB = os.environ.get("FIRESTORE_DB", "productivitydatabase")
 MODEL_NAME = os.environ.get("MODEL_NAME", "gemini-2.0-flash-lite")
 
 
+FS_POOL_SIZE = int(os.environ.get("FS_POOL_SIZE", "4"))
+
 app = FastAPI()
-templates = Jinja2Templates(directory="templates")
-db = firestore.Client(database=FIRESTORE_DB)
+
+
+class HealthzMiddleware:
+    """Answers /healthz before the router runs.
+
+    Liveness probes hit this path several times a second; a raw ASGI
+    short-circuit skips FastAPI dispatch and response serialization.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] == "/healthz":
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [(b"content-type", b"text/plain; charset=utf-8")],
+            })
+            await send({"type": "http.response.body", "body": b"ok"})
+            return
+        await self.app(scope, receive, send)
+
+
+app.add_middleware(HealthzMiddleware)
+
+# Compiled templates are cached to disk and never re-parsed per request;
+# rendering is streamed so the browser gets bytes before the full page
+# is built.
+_JINJA_CACHE_DIR = os.environ.get("JINJA_CACHE_DIR", "/tmp/jinja_cache")
+os.makedirs(_JINJA_CACHE_DIR, exist_ok=True)
+_jinja_env = Environment(
+    loader=FileSystemLoader("templates"),
+    bytecode_cache=FileSystemBytecodeCache(_JINJA_CACHE_DIR),
+    auto_reload=False,
+    autoescape=True,
+)
+_index_tmpl = _jinja_env.get_template("index.html")
+
+
+def render_index(ctx: Dict[str, Any]) -> StreamingResponse:
+    return StreamingResponse(_index_tmpl.generate(ctx), media_type="text/html")
+
+# A few pre-warmed clients round-robined per request; a single gRPC
+# channel suffers head-of-line blocking at high concurrency (p99).
+_FS_CLIENTS = [firestore.AsyncClient(database=FIRESTORE_DB) for _ in range(FS_POOL_SIZE)]
+_fs_cycle = itertools.cycle(_FS_CLIENTS)
+
+
+def _db() -> firestore.AsyncClient:
+    return next(_fs_cycle)
+
+# Vertex AI init is expensive (credential/metadata discovery) — do it once per worker.
+vertexai.init(project=PROJECT_ID, location=REGION)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_model() -> GenerativeModel:
+    # JSON mode: the model returns bare JSON, no prose or ``` fences
+    return GenerativeModel(
+        MODEL_NAME,
+        generation_config={"response_mime_type": "application/json"},
+    )
 
 
 # ---- Helpers ----
 def now_utc_iso() -> str:
-    return datetime.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    return (
+        datetime.datetime.now(datetime.timezone.utc)
+        .isoformat(timespec="seconds")
+        .replace("+00:00", "Z")
+    )
 
 
 def today_local_date() -> datetime.date:
@@ -50,12 +126,23 @@ def current_week_id() -> str:
 
 def safe_parse_json(text: str) -> Dict[str, Any]:
     """
-    Gemini sometimes returns extra text around JSON.
-    This tries to extract the first {...} block.
+    With JSON mode enabled the response is pure JSON, so the fast path
+    is a single orjson.loads. The brace-scan fallback stays for the rare
+    case where the model still wraps the JSON in prose or ``` fences.
     """
     if not text:
         return {"error": "Empty model response"}
 
+    try:
+        parsed = orjson.loads(text)
+    except orjson.JSONDecodeError:
+        pass
+    else:
+        # JSON mode can emit a top-level array; callers expect a dict,
+        # so anything else falls through to the brace scan
+        if isinstance(parsed, dict):
+            return parsed
+
     t = text.strip()
 
     # Remove ```json fences if present
@@ -69,15 +156,16 @@ def safe_parse_json(text: str) -> Dict[str, Any]:
         t = t[start : end + 1]
 
     try:
-        return json.loads(t)
-    except Exception:
-        return {"error": "Model did not return valid JSON", "raw": text}
+        parsed = orjson.loads(t)
+    except orjson.JSONDecodeError:
+        parsed = None
+    if isinstance(parsed, dict):
+        return parsed
+    return {"error": "Model did not return valid JSON", "raw": text}
 
 
-def call_gemini_json(prompt: str) -> Dict[str, Any]:
-    vertexai.init(project=PROJECT_ID, location=REGION)
-    model = GenerativeModel(MODEL_NAME)
-    resp = model.generate_content(prompt)
+async def call_gemini_json(prompt: str) -> Dict[str, Any]:
+    resp = await _get_model().generate_content_async(prompt)
     return safe_parse_json(resp.text)
 
 
@@ -86,14 +174,16 @@ WEEKLY_PLANS_COL = "weekly_plans"
 EVENTS_COL = "events_log"
 
 
-def week_doc_ref(user_id: str, week_id: str):
-    return db.collection(WEEKLY_PLANS_COL).document(f"{user_id}__{week_id}")
+def week_doc_ref(user_id: str, week_id: str, client=None):
+    # callers doing several related ops pass one pooled client so the
+    # whole operation stays on a single channel
+    return (client or _db()).collection(WEEKLY_PLANS_COL).document(f"{user_id}__{week_id}")
 
 
-def get_or_init_week(user_id: str) -> Dict[str, Any]:
+async def get_or_init_week(user_id: str, client=None) -> Dict[str, Any]:
     week_id = current_week_id()
-    ref = week_doc_ref(user_id, week_id)
-    snap = ref.get()
+    ref = week_doc_ref(user_id, week_id, client=client)
+    snap = await ref.get()
 
     if snap.exists:
         data = snap.to_dict() or {}
@@ -115,21 +205,62 @@ def get_or_init_week(user_id: str) -> Dict[str, Any]:
         "created_at": now_utc_iso(),
         "updated_at": now_utc_iso(),
     }
-    ref.set(data)
+    await ref.set(data)
     return data
 
 
-def save_week(user_id: str, week_doc: Dict[str, Any]) -> None:
-    ref = week_doc_ref(user_id, week_doc["week_id"])
-    ref.set(week_doc)
+async def update_week_fields(user_id: str, week_id: str,
+                             fields: Dict[str, Any], batch=None, client=None) -> None:
+    """Field-level update — transmits only what changed, not the whole doc."""
+    ref = week_doc_ref(user_id, week_id, client=client)
+    if batch is not None:
+        batch.update(ref, fields)
+        return
+    await ref.update(fields)
 
 
-def log_event(payload: Dict[str, Any]) -> None:
-    payload.setdefault("created_at", now_utc_iso())
-    db.collection(EVENTS_COL).add(payload)
+async def log_event(payload: Dict[str, Any], batch=None, ts: Optional[str] = None,
+                    client=None) -> None:
+    payload.setdefault("created_at", ts or now_utc_iso())
+    events = (client or _db()).collection(EVENTS_COL)
+    if batch is not None:
+        batch.set(events.document(), payload)
+        return
+    await events.add(payload)
 
 
 # ---- Weekly plan display: add actual dates ----
+_DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+_DAY_SET = frozenset(_DAYS)
+
+
+@functools.lru_cache(maxsize=8)
+def _week_dates(week_id: str) -> tuple:
+    """Monday..Sunday ISO dates for a week id like 2026-W08, cached per week."""
+    year_str, week_str = week_id.split("-W")
+    week_start = datetime.date.fromisocalendar(int(year_str), int(week_str), 1)
+    return tuple(
+        (week_start + datetime.timedelta(days=offset)).isoformat()
+        for offset in range(7)
+    )
+
+
+# Pretty-printed week doc keyed by (week_id, version); version bumps on
+# every write, so stale entries can never be served.
+_week_pretty_cache: Dict[tuple, str] = {}
+
+
+def _render_week_pretty(week_doc: Dict[str, Any]) -> str:
+    key = (week_doc.get("week_id"), week_doc.get("version", 0))
+    cached = _week_pretty_cache.get(key)
+    if cached is None:
+        cached = orjson.dumps(week_doc, option=orjson.OPT_INDENT_2).decode()
+        if len(_week_pretty_cache) >= 32:
+            _week_pretty_cache.clear()
+        _week_pretty_cache[key] = cached
+    return cached
+
+
 def weekly_plan_to_by_date(week_id: str, weekly_plan: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     """
     Convert weekly_plan:
@@ -141,33 +272,52 @@ def weekly_plan_to_by_date(week_id: str, weekly_plan: List[Dict[str, Any]]) -> L
     if not week_id or "-W" not in week_id:
         return []
 
-    year_str, week_str = week_id.split("-W")
-    iso_year = int(year_str)
-    iso_week = int(week_str)
+    normalized = {
+        item["day"]: (item.get("blocks") or [])
+        for item in (weekly_plan or [])
+        if item.get("day") in _DAY_SET
+    }
 
-    # Monday of ISO week
-    week_start = datetime.date.fromisocalendar(iso_year, iso_week, 1)
+    return [
+        {"day": day, "date": date, "blocks": normalized.get(day, [])}
+        for day, date in zip(_DAYS, _week_dates(week_id))
+    ]
 
-    day_to_offset = {
-        "Monday": 0, "Tuesday": 1, "Wednesday": 2, "Thursday": 3,
-        "Friday": 4, "Saturday": 5, "Sunday": 6
-    }
 
-    normalized = {}
-    for item in weekly_plan or []:
-        day = item.get("day")
-        if day in day_to_offset:
-            normalized[day] = item.get("blocks", []) or []
+# ---- Pending tasks payload (round-tripped through the form) ----
+class Task(BaseModel):
+    title: str
+    due: Optional[str] = None
+    estimated_minutes: Optional[int] = None
+    priority: Optional[str] = None
+    category: Optional[str] = None
+    notes: Optional[str] = None
+
+
+class PendingTasks(BaseModel):
+    tasks: List[Task]
 
-    out = []
-    for day, offset in day_to_offset.items():
-        d = week_start + datetime.timedelta(days=offset)
-        out.append({
-            "day": day,
-            "date": d.isoformat(),
-            "blocks": normalized.get(day, []),
-        })
 
+# ---- Task list hygiene ----
+# Cap how many tasks get inlined into a prompt; beyond this the older
+# ones are summarized as a count so prompt tokens stay bounded.
+MAX_PROMPT_TASKS = 50
+
+
+def _task_key(task: Dict[str, Any]) -> tuple:
+    return ((task.get("title") or "").strip().lower(), task.get("due"))
+
+
+def _dedupe_tasks(existing: List[Dict[str, Any]],
+                  incoming: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Drop incoming tasks already present (same normalized title + due)."""
+    seen = {_task_key(t) for t in existing or []}
+    out = []
+    for t in incoming or []:
+        key = _task_key(t)
+        if key not in seen:
+            seen.add(key)
+            out.append(t)
     return out
 
 
@@ -204,6 +354,8 @@ User text:
 def build_update_week_prompt(existing_weekly_plan: List[Dict[str, Any]],
                              all_tasks: List[Dict[str, Any]],
                              new_tasks: List[Dict[str, Any]]) -> str:
+    omitted = max(0, len(all_tasks) - MAX_PROMPT_TASKS)
+    prompt_tasks = all_tasks[-MAX_PROMPT_TASKS:]
     return f"""
 You are a weekly planning assistant.
 
@@ -233,70 +385,225 @@ Constraints:
 - Add new tasks into open times; if cannot fit, put in conflicts.
 
 Existing weekly plan JSON:
-{json.dumps(existing_weekly_plan, ensure_ascii=False)}
+{orjson.dumps(existing_weekly_plan).decode()}
 
-All tasks (existing + new) JSON:
-{json.dumps(all_tasks, ensure_ascii=False)}
+Recent tasks (existing + new) JSON ({omitted} older tasks not shown):
+{orjson.dumps(prompt_tasks).decode()}
 
-New tasks to add (most important):
-{json.dumps(new_tasks, ensure_ascii=False)}
+The new tasks to add (most important) are the last {len(new_tasks)} entries of the task list above (indices {len(prompt_tasks) - len(new_tasks)}..{len(prompt_tasks) - 1}).
 """.strip()
 
 
-# ---- Routes ----
-@app.get("/healthz")
-def healthz():
-    return {"ok": True, "time": now_utc_iso()}
+def build_extract_and_plan_prompt(text: str,
+                                  existing_weekly_plan: List[Dict[str, Any]],
+                                  existing_tasks: List[Dict[str, Any]]) -> str:
+    omitted = max(0, len(existing_tasks) - MAX_PROMPT_TASKS)
+    prompt_tasks = existing_tasks[-MAX_PROMPT_TASKS:]
+    return f"""
+You are a task extraction and weekly planning assistant.
+
+First extract actionable tasks from the user's text, then update the weekly schedule (Monday-Sunday) to fit them. Output ONLY valid JSON with this schema:
+{{
+  "tasks": [
+    {{
+      "title": "string",
+      "due": "string (optional, e.g., 2026-02-23 or 'Friday' or 'tomorrow')",
+      "estimated_minutes": number (optional),
+      "priority": "low|medium|high (optional)",
+      "category": "string (optional)",
+      "notes": "string (optional)"
+    }}
+  ],
+  "weekly_plan": [
+    {{
+      "day": "Monday|Tuesday|Wednesday|Thursday|Friday|Saturday|Sunday",
+      "blocks": [
+        {{
+          "start": "HH:MM",
+          "end": "HH:MM",
+          "task": "string",
+          "notes": "string (optional)"
+        }}
+      ]
+    }}
+  ],
+  "changes": ["string"],
+  "conflicts": ["string"]
+}}
 
+Extraction rules:
+- Keep titles short and actionable.
+- If user did not provide due date/time, omit "due".
+- If you are unsure, omit the field.
 
-@app.get("/", response_class=HTMLResponse)
-def home(request: Request):
-    # show current week even on first load
-    week_doc = get_or_init_week(DEFAULT_USER_ID)
-    week_id = week_doc.get("week_id")
-    week_version = week_doc.get("version", 0)
-    weekly_by_date = weekly_plan_to_by_date(week_id, week_doc.get("weekly_plan", []))
-
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "input_text": "",
-            "extracted_pretty": None,
-            "extracted_tasks": [],
-            "pending_tasks_json": None,
-            "week_id": week_id,
-            "week_version": week_version,
-            "weekly_by_date": weekly_by_date,
-        }
+Scheduling constraints:
+- Keep a realistic schedule (avoid 00:00-06:00).
+- Prefer 30-120 min blocks.
+- Do NOT delete existing blocks unless necessary; adjust carefully.
+- Add the extracted tasks into open times; if cannot fit, put in conflicts.
+
+Existing weekly plan JSON:
+{orjson.dumps(existing_weekly_plan).decode()}
+
+Recent existing tasks JSON ({omitted} older tasks not shown):
+{orjson.dumps(prompt_tasks).decode()}
+
+User text:
+{text}
+""".strip()
+
+
+async def extract_and_plan(text: str,
+                           existing_weekly_plan: List[Dict[str, Any]],
+                           existing_tasks: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return await call_gemini_json(
+        build_extract_and_plan_prompt(text, existing_weekly_plan, existing_tasks)
     )
 
 
+# ---- Background add jobs ----
+# confirm_add no longer blocks the HTTP request on Gemini + Firestore;
+# the work runs in a task and progress is streamed over SSE.
+_jobs: Dict[str, asyncio.Queue] = {}
+_job_tasks: set = set()
+
+# How long a finished job's queue stays around for a late SSE subscriber
+# before it is dropped; without this, unconsumed jobs leak their queues.
+JOB_GRACE_SECONDS = 60
+
+
+def _start_job(coro) -> str:
+    job_id = uuid.uuid4().hex
+    _jobs[job_id] = asyncio.Queue()
+    task = asyncio.create_task(coro(job_id))
+    _job_tasks.add(task)
+
+    def _finish(t: asyncio.Task) -> None:
+        _job_tasks.discard(t)
+        asyncio.get_event_loop().call_later(JOB_GRACE_SECONDS, _jobs.pop, job_id, None)
+
+    task.add_done_callback(_finish)
+    return job_id
+
+
+async def _job_put(job_id: str, event: Dict[str, Any]) -> None:
+    q = _jobs.get(job_id)
+    if q is not None:
+        await q.put(event)
+
+
+async def _run_confirm_add(job_id: str, new_tasks: List[Dict[str, Any]], ts: str) -> None:
+    try:
+        await _job_put(job_id, {"status": "planning"})
+        client = _db()  # one client for the whole job
+        week_doc = await get_or_init_week(DEFAULT_USER_ID, client=client)
+        existing_plan = week_doc.get("weekly_plan", [])
+        existing_tasks = week_doc.get("tasks", []) or []
+
+        new_tasks = _dedupe_tasks(existing_tasks, new_tasks)
+        if not new_tasks:
+            await _job_put(job_id, {
+                "status": "done",
+                "week_id": week_doc["week_id"],
+                "version": week_doc.get("version", 0),
+                "changes": [],
+                "conflicts": [],
+                "message": "All tasks were already in the week.",
+            })
+            return
+        tasks_updated = existing_tasks + new_tasks
+
+        updated = await call_gemini_json(
+            build_update_week_prompt(existing_plan, tasks_updated, new_tasks)
+        )
+
+        await _job_put(job_id, {"status": "saving"})
+        week_doc["weekly_plan"] = updated.get("weekly_plan", [])
+        week_doc["version"] = int(week_doc.get("version", 0)) + 1
+        # one batched commit instead of two round trips;
+        # ArrayUnion/Increment keep the payload O(new tasks)
+        batch = client.batch()
+        await update_week_fields(DEFAULT_USER_ID, week_doc["week_id"], {
+            "tasks": firestore.ArrayUnion(new_tasks),
+            "weekly_plan": week_doc["weekly_plan"],
+            "version": firestore.Increment(1),
+            "updated_at": ts,
+        }, batch=batch, client=client)
+        await log_event({
+            "type": "ui_add_to_week",
+            "user_id": DEFAULT_USER_ID,
+            "week_id": week_doc["week_id"],
+            "new_tasks": new_tasks,
+            "changes": updated.get("changes", []),
+            "conflicts": updated.get("conflicts", []),
+        }, batch=batch, ts=ts, client=client)
+        await batch.commit()
+
+        await _job_put(job_id, {
+            "status": "done",
+            "week_id": week_doc["week_id"],
+            "version": week_doc["version"],
+            "changes": updated.get("changes", []),
+            "conflicts": updated.get("conflicts", []),
+        })
+    except Exception as e:
+        await _job_put(job_id, {"status": "error", "error": str(e)})
+
+
+# ---- Routes ----
+@app.get("/", response_class=HTMLResponse)
+async def home(request: Request):
+    # read-only: render the stored week if it exists, but don't create
+    # the doc until the user actually adds a task
+    week_id = current_week_id()
+    week_version = 0
+    weekly_by_date: List[Dict[str, Any]] = []
+
+    snap = await week_doc_ref(DEFAULT_USER_ID, week_id).get()
+    if snap.exists:
+        data = snap.to_dict() or {}
+        week_version = data.get("version", 0)
+        weekly_by_date = weekly_plan_to_by_date(week_id, data.get("weekly_plan", []))
+
+    return render_index({
+        "request": request,
+        "input_text": "",
+        "extracted_pretty": None,
+        "extracted_tasks": [],
+        "pending_tasks_json": None,
+        "job_id": None,
+        "week_id": week_id,
+        "week_version": week_version,
+        "weekly_by_date": weekly_by_date,
+    })
+
+
 @app.post("/ui/action", response_class=HTMLResponse)
-def ui_action(
+async def ui_action(
     request: Request,
     text: str = Form(""),
     action: str = Form("extract_preview"),
     pending_tasks_json: str = Form("")
 ):
     input_text = (text or "").strip()
+    ts = now_utc_iso()  # one timestamp for everything this request writes
 
     extracted_pretty: Optional[str] = None
     extracted_tasks: List[Dict[str, Any]] = []
     pending_tasks_json_out: Optional[str] = None
+    job_id: Optional[str] = None
 
-    # always load current week for display
-    week_doc = get_or_init_week(DEFAULT_USER_ID)
-    week_id = week_doc.get("week_id")
-    week_version = week_doc.get("version", 0)
-    weekly_by_date = weekly_plan_to_by_date(week_id, week_doc.get("weekly_plan", []))
+    # only actions that touch the stored week read it from Firestore
+    week_id = current_week_id()
+    week_version = 0
+    weekly_by_date: List[Dict[str, Any]] = []
 
     try:
         if action == "extract_preview":
             if not input_text:
                 extracted_pretty = json.dumps({"error": "Please paste text first."}, indent=2, ensure_ascii=False)
             else:
-                extracted = call_gemini_json(build_extract_prompt(input_text))
+                extracted = await call_gemini_json(build_extract_prompt(input_text))
                 extracted_tasks = extracted.get("tasks", []) or []
                 pending = {"tasks": extracted_tasks}
                 pending_tasks_json_out = json.dumps(pending, ensure_ascii=False)
@@ -306,50 +613,37 @@ def ui_action(
             if not pending_tasks_json:
                 extracted_pretty = json.dumps({"error": "No extracted tasks to add. Please Extract first."}, indent=2, ensure_ascii=False)
             else:
-                pending = json.loads(pending_tasks_json)
-                new_tasks = pending.get("tasks", [])
-                if not isinstance(new_tasks, list) or len(new_tasks) == 0:
+                # parse + validate in one pass; invalid payloads surface
+                # through the route's error handler below
+                pending = PendingTasks.model_validate_json(pending_tasks_json)
+                if not pending.tasks:
                     extracted_pretty = json.dumps({"error": "Extracted task list is empty."}, indent=2, ensure_ascii=False)
                 else:
-                    existing_plan = week_doc.get("weekly_plan", [])
-                    tasks_updated = (week_doc.get("tasks", []) or []) + new_tasks
-
-                    updated = call_gemini_json(build_update_week_prompt(existing_plan, tasks_updated, new_tasks))
-
-                    week_doc["tasks"] = tasks_updated
-                    week_doc["weekly_plan"] = updated.get("weekly_plan", [])
-                    week_doc["version"] = int(week_doc.get("version", 0)) + 1
-                    week_doc["updated_at"] = now_utc_iso()
-                    save_week(DEFAULT_USER_ID, week_doc)
-
-                    log_event({
-                        "type": "ui_add_to_week",
-                        "user_id": DEFAULT_USER_ID,
-                        "week_id": week_doc["week_id"],
-                        "new_tasks": new_tasks,
-                        "changes": updated.get("changes", []),
-                        "conflicts": updated.get("conflicts", []),
-                    })
-
-                    # refresh plan display after update
-                    week_id = week_doc.get("week_id")
-                    week_version = week_doc.get("version", 0)
-                    weekly_by_date = weekly_plan_to_by_date(week_id, week_doc.get("weekly_plan", []))
+                    new_tasks = [t.model_dump(exclude_none=True) for t in pending.tasks]
+                    # hand the Gemini + Firestore work to a background job
+                    # and return immediately; the page subscribes to the
+                    # SSE progress stream and reloads when the job is done
+                    job_id = _start_job(lambda jid: _run_confirm_add(jid, new_tasks, ts))
+
+                    # show the current (pre-update) plan while the job runs
+                    snap = await week_doc_ref(DEFAULT_USER_ID, week_id).get()
+                    if snap.exists:
+                        data = snap.to_dict() or {}
+                        week_version = data.get("version", 0)
+                        weekly_by_date = weekly_plan_to_by_date(week_id, data.get("weekly_plan", []))
 
                     extracted_pretty = json.dumps({
-                        "message": "Tasks added to weekly plan.",
+                        "message": "Add job started.",
+                        "job_id": job_id,
                         "week_id": week_id,
-                        "version": week_version,
-                        "changes": updated.get("changes", []),
-                        "conflicts": updated.get("conflicts", []),
                     }, indent=2, ensure_ascii=False)
 
         elif action == "view_week":
-            week_doc = get_or_init_week(DEFAULT_USER_ID)
+            week_doc = await get_or_init_week(DEFAULT_USER_ID)
             week_id = week_doc.get("week_id")
             week_version = week_doc.get("version", 0)
             weekly_by_date = weekly_plan_to_by_date(week_id, week_doc.get("weekly_plan", []))
-            extracted_pretty = json.dumps(week_doc, indent=2, ensure_ascii=False)
+            extracted_pretty = _render_week_pretty(week_doc)
 
         else:
             extracted_pretty = json.dumps({"error": f"Unknown action: {action}"}, indent=2, ensure_ascii=False)
@@ -357,66 +651,104 @@ def ui_action(
     except Exception as e:
         extracted_pretty = json.dumps({"error": str(e)}, indent=2, ensure_ascii=False)
 
-    return templates.TemplateResponse(
-        "index.html",
-        {
-            "request": request,
-            "input_text": input_text,
-            "extracted_pretty": extracted_pretty,
-            "extracted_tasks": extracted_tasks,
-            "pending_tasks_json": pending_tasks_json_out,  # only set after extract
-            "week_id": week_id,
-            "week_version": week_version,
-            "weekly_by_date": weekly_by_date,
-        }
-    )
+    return render_index({
+        "request": request,
+        "input_text": input_text,
+        "extracted_pretty": extracted_pretty,
+        "extracted_tasks": extracted_tasks,
+        "pending_tasks_json": pending_tasks_json_out,  # only set after extract
+        "job_id": job_id,  # only set after confirm_add
+        "week_id": week_id,
+        "week_version": week_version,
+        "weekly_by_date": weekly_by_date,
+    })
+
+
+@app.get("/ui/progress/{job_id}")
+async def ui_progress(job_id: str):
+    q = _jobs.get(job_id)
+    if q is None:
+        return JSONResponse({"error": "Unknown job"}, status_code=404)
+
+    async def stream():
+        try:
+            while True:
+                event = await q.get()
+                yield f"data: {orjson.dumps(event).decode()}\n\n"
+                if event.get("status") in ("done", "error"):
+                    break
+        finally:
+            _jobs.pop(job_id, None)
+
+    return StreamingResponse(stream(), media_type="text/event-stream")
 
 
 # ---- Optional API endpoints (useful for demo/report) ----
 @app.post("/api/extract")
-def api_extract(payload: Dict[str, Any]):
+async def api_extract(payload: Dict[str, Any]):
     text = (payload.get("text") or "").strip()
     if not text:
         return JSONResponse({"error": "Missing text"}, status_code=400)
-    extracted = call_gemini_json(build_extract_prompt(text))
+    extracted = await call_gemini_json(build_extract_prompt(text))
     return extracted
 
 
 @app.get("/api/weekly/get")
-def api_weekly_get():
-    week_doc = get_or_init_week(DEFAULT_USER_ID)
+async def api_weekly_get():
+    week_doc = await get_or_init_week(DEFAULT_USER_ID)
     return week_doc
 
 
 @app.post("/api/weekly/add_text")
-def api_weekly_add_text(payload: Dict[str, Any]):
+async def api_weekly_add_text(payload: Dict[str, Any]):
     text = (payload.get("text") or "").strip()
     if not text:
         return JSONResponse({"error": "Missing text"}, status_code=400)
+    ts = now_utc_iso()  # one timestamp for everything this request writes
 
-    extracted = call_gemini_json(build_extract_prompt(text))
-    new_tasks = extracted.get("tasks", []) or []
-
-    week_doc = get_or_init_week(DEFAULT_USER_ID)
+    client = _db()  # one client for the whole request
+    week_doc = await get_or_init_week(DEFAULT_USER_ID, client=client)
     existing_plan = week_doc.get("weekly_plan", [])
-    tasks_updated = (week_doc.get("tasks", []) or []) + new_tasks
-
-    updated = call_gemini_json(build_update_week_prompt(existing_plan, tasks_updated, new_tasks))
+    existing_tasks = week_doc.get("tasks", []) or []
+
+    # single Gemini round trip: extract tasks and replan the week together
+    updated = await extract_and_plan(text, existing_plan, existing_tasks)
+    new_tasks = _dedupe_tasks(existing_tasks, updated.get("tasks", []) or [])
+    if not new_tasks:
+        # nothing to add (no tasks extracted, or all duplicates) — skip the
+        # write; ArrayUnion also rejects empty lists
+        return {
+            "message": "No new tasks to add; weekly plan unchanged.",
+            "week_id": week_doc["week_id"],
+            "version": week_doc.get("version", 0),
+            "changes": [],
+            "conflicts": [],
+            "weekly_plan": existing_plan,
+        }
+    tasks_updated = existing_tasks + new_tasks
 
     week_doc["tasks"] = tasks_updated
     week_doc["weekly_plan"] = updated.get("weekly_plan", [])
     week_doc["version"] = int(week_doc.get("version", 0)) + 1
-    week_doc["updated_at"] = now_utc_iso()
-    save_week(DEFAULT_USER_ID, week_doc)
-
-    log_event({
+    week_doc["updated_at"] = ts
+    # one batched commit instead of two round trips;
+    # ArrayUnion/Increment keep the payload O(new tasks)
+    batch = client.batch()
+    await update_week_fields(DEFAULT_USER_ID, week_doc["week_id"], {
+        "tasks": firestore.ArrayUnion(new_tasks),
+        "weekly_plan": week_doc["weekly_plan"],
+        "version": firestore.Increment(1),
+        "updated_at": ts,
+    }, batch=batch, client=client)
+    await log_event({
         "type": "api_add_text",
         "user_id": DEFAULT_USER_ID,
         "week_id": week_doc["week_id"],
         "new_tasks": new_tasks,
         "changes": updated.get("changes", []),
         "conflicts": updated.get("conflicts", []),
-    })
+    }, batch=batch, ts=ts, client=client)
+    await batch.commit()
 
     return {
         "message": "Added tasks and updated weekly plan.",